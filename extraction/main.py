@@ -1,24 +1,91 @@
 """
 Decision tree extraction from medical text.
 """
+import logging
+import queue
+import threading
+from typing import Any, Dict, List
+
+from extraction.chunking import chunk_text
+from extraction.model import get_vllm_engine
+from extraction.pipeline import (
+    extract_from_html,
+    fetch_html_via_url,
+    load_topic_map,
+    run_extraction_pipeline,
+    synthesize_trees,
+    write_decision_tree_to_file,
+)
 from extraction.tree_parser import parser_util
-from pipeline import get_response, load_topic_map
 
+logger = logging.getLogger(__name__)
 
 
-if __name__ == "__main__":
-    response = get_response()
-    print(response)
+def main_single_article(topic: str, topic_map: Dict[str, str], engine=None) -> List[Dict[Any, Any]]:
+    """
+    Fetch one article from the topic map and extract its decision trees.
+    """
+    url = topic_map[topic]
+    html_content = fetch_html_via_url(url)
+    article_text = extract_from_html(html_content)
+    text_chunks = chunk_text(article_text)
+
+    partial_trees = run_extraction_pipeline(text_chunks, engine=engine)
+
+    return [parser_util(tree) for tree in partial_trees]
+
+
+# Sentinel marking the end of the article stream.
+_DONE = object()
+
+
+def main_all() -> Dict[str, List[Dict[Any, Any]]]:
+    """
+    Extract decision trees for every topic in the topic map, loading the
+    model once up front instead of once per article.
 
+    Fetching and HTML parsing run in a producer thread feeding a bounded
+    queue, so network latency for the next article is hidden behind GPU
+    inference on the current one.
+    """
     topic_map = load_topic_map()
-    
-    url = topic_map.get('High Blood Pressure')
-    #html_content = fetch_html_via_url(url)
-    #response = extract_from_html(html_content)
-    #print(response)
-
-    parsed_data = parser_util(response)
-    print(parsed_data)
+    engine = get_vllm_engine()
+
+    article_queue: "queue.Queue" = queue.Queue(maxsize=2)
+
+    def producer() -> None:
+        # A failed fetch skips that topic rather than aborting the run;
+        # the finally guarantees _DONE is enqueued even if the thread
+        # dies, so the consumer below can never block forever.
+        try:
+            for topic in topic_map:
+                try:
+                    html_content = fetch_html_via_url(topic_map[topic])
+                except Exception:
+                    logger.warning("Skipping topic %r: fetch failed", topic, exc_info=True)
+                    continue
+                article_text = extract_from_html(html_content)
+                article_queue.put((topic, chunk_text(article_text)))
+        finally:
+            article_queue.put(_DONE)
+
+    threading.Thread(target=producer, daemon=True).start()
+
+    results: Dict[str, List[Dict[Any, Any]]] = {}
+    while (item := article_queue.get()) is not _DONE:
+        topic, text_chunks = item
+        partial_trees = run_extraction_pipeline(text_chunks, engine=engine)
+        final_decision_tree = synthesize_trees(partial_trees, engine=engine)
+        write_decision_tree_to_file(final_decision_tree, f"{topic}.tree.txt")
+        results[topic] = [parser_util(tree) for tree in partial_trees]
+
+    return results
+
+
+if __name__ == "__main__":
+    for topic, trees in main_all().items():
+        print(topic)
+        print(trees)
 
 # Xformers is not installed correctly. If you want to use memory_efficient_attention to accelerate training use the following command to install Xformers
 # pip install xformers.
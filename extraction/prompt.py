@@ -12,13 +12,16 @@ class Message(TypedDict):
 # Medical text from the article's example
 tonic_clonic_seizures_example = """For patients with generalized tonic-clonic seizures, valproic acid is applicable. If not applicable, and the patient has myoclonic seizures or suspected juvenile myoclonic epilepsy, carbamazepine should not be used."""
 
-def build_prompt(medical_text: str = tonic_clonic_seizures_example) -> List[Message]:
-    # This prompt guides the model through the Chain-of-Thought process
-    prompt_template = f"""
+# The instruction block is split around the per-chunk medical text so the
+# static parts are built (and, with prefix caching, prefilled) only once.
+# This prompt guides the model through the Chain-of-Thought process.
+PROMPT_PREFIX = """
     You are an expert at extracting medical decision trees (MDTs) from text and formatting them.
 
     Here is the medical text:
-    "{medical_text}"
+    \""""
+
+PROMPT_SUFFIX = """\"
 
     Follow these steps carefully:
     1.  First, identify all **Decision Points** (questions to be asked) and final **Outcomes** (conclusions or actions).
@@ -47,9 +50,16 @@ ______
     [Your thinking process starts here...]
     """
 
+
+def build_prompt_str(medical_text: str = tonic_clonic_seizures_example) -> str:
+    # Only the chunk text varies; the boilerplate is not re-serialized.
+    return PROMPT_PREFIX + medical_text + PROMPT_SUFFIX
+
+
+def build_prompt(medical_text: str = tonic_clonic_seizures_example) -> List[Message]:
     # Structure the input as a list of messages
     messages: List[Message] = [
-        Message(role="user", content=prompt_template)
+        Message(role="user", content=build_prompt_str(medical_text))
     ]
 
     return messages
@@ -1,4 +1,5 @@
-from typing import Dict, Any
+from bisect import bisect_right
+from typing import Any, Dict, List, Tuple, Union
 
 BP_DECISION_TREE: Dict[str, Any] = {
     "question": "What is your diastolic blood pressure?",
@@ -28,3 +29,72 @@ BP_DECISION_TREE: Dict[str, Any] = {
     }
 }
 
+
+
+# A node compiled for binary-search evaluation: the question text, the
+# sorted interval boundaries, and one target (subtree or leaf string) per
+# half-open interval between them.
+CompiledNode = Tuple[str, List[int], List[Any]]
+
+
+def _first_match(branches: Dict[Any, Any], value: int) -> Any:
+    """
+    Evaluates the tuple-keyed branches the way the decision engine does:
+    first matching condition wins.
+    """
+    for (op, ref), target in branches.items():
+        if op == '>=' and value >= ref:
+            return target
+        if op == '<' and value < ref:
+            return target
+        if op == 'in' and value in ref:
+            return target
+    return None
+
+
+def compile_threshold_tree(node: Union[Dict[str, Any], str]) -> Union[CompiledNode, str]:
+    """
+    Walks a tuple-keyed decision tree once into (question, thresholds,
+    targets) records, so a lookup is a bisect over sorted boundaries
+    instead of iterating dict keys and dispatching on op strings.
+    """
+    if not isinstance(node, dict):
+        return node  # leaf decision string
+
+    branches = node["branches"]
+
+    # Every comparison boundary splits the integer line into half-open
+    # intervals; inside one interval the matching branch cannot change.
+    points = set()
+    for op, ref in branches:
+        if op == 'in':
+            points.add(ref.start)
+            points.add(ref.stop)
+        else:
+            points.add(ref)
+    thresholds = sorted(points)
+
+    # One representative value per interval selects its branch.
+    representatives = [thresholds[0] - 1] + thresholds
+    targets = [
+        compile_threshold_tree(_first_match(branches, rep))
+        for rep in representatives
+    ]
+
+    return (node["question"], thresholds, targets)
+
+
+def threshold_lookup(compiled: Union[CompiledNode, str], answers: Dict[str, int]) -> Any:
+    """
+    Follows a compiled tree to a leaf in O(log n) per decision.
+
+    :param compiled: A tree produced by `compile_threshold_tree`.
+    :param answers: Maps each question text to its integer value.
+    """
+    while isinstance(compiled, tuple):
+        question, thresholds, targets = compiled
+        compiled = targets[bisect_right(thresholds, answers[question])]
+    return compiled
+
+
+BP_DECISION_TREE_COMPILED: CompiledNode = compile_threshold_tree(BP_DECISION_TREE)
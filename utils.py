@@ -4,40 +4,430 @@ and converting them into a format suitable for decision-making logic.
 
 Meant for use in the `ArsMedicaTech` application, but can be adapted for other uses.
 """
+from collections import OrderedDict
+from functools import lru_cache
 from typing import Dict, Any, Union
 
+import hashlib
+import json
+import sys
+
+@lru_cache(maxsize=1024)
 def parse_condition_key(key: str) -> Union[tuple, str]:
     """
     Converts a string condition key from JSON into a Python condition tuple.
+
+    Cached because trees reuse the same condition strings across many
+    sibling and nested branches; repeat keys become a single dict hit.
     """
     key = key.strip()
-    if '-' in key:
-        lower, upper = map(int, key.split('-'))
+    if not key:
+        return key
+
+    # Dispatch on the leading character instead of scanning the whole
+    # string once per candidate format.
+    c0 = key[0]
+    if c0 == '<':
+        return ('<', int(key[1:]))
+    if c0 == '>' and key[1:2] == '=':
+        return ('>=', int(key[2:]))
+
+    # "lower-upper" range; start the search at 1 to skip a leading minus.
+    dash_idx = key.find('-', 1)
+    if dash_idx > 0:
+        lower, upper = int(key[:dash_idx]), int(key[dash_idx + 1:])
+        # Small spans become frozensets: still O(1) membership but also
+        # hashable and safe for non-int probes, which range is not. Very
+        # wide spans stay as range to bound memory.
+        if upper - lower < 1024:
+            return ('in', frozenset(range(lower, upper + 1)))
         return ('in', range(lower, upper + 1))
-    elif key.startswith('>='):
-        return ('>=', int(key[2:].strip()))
-    elif key.startswith('<'):
-        return ('<', int(key[1:].strip()))
-    else:
-        return key  # Fallback for unknown format
 
+    # Fallback for unknown format; interned so identical string conditions
+    # across subtrees share one object and compare by identity first.
+    return sys.intern(key)
+
+
+@lru_cache(maxsize=1024)
+def compile_condition(key: str):
+    """
+    Compiles a string condition key into a predicate closure.
+
+    The tuple form from `parse_condition_key` makes the decision engine
+    re-dispatch on the op tag at every node visit; a closure bakes the op
+    and threshold in as defaults, so evaluation is one indirect call with
+    no tag compare. The tuple API stays for callers that inspect conditions.
+    """
+    condition = parse_condition_key(key)
+    if condition.__class__ is not tuple:
+        return lambda x, k=condition: x == k
+
+    op, ref = condition
+    if op == '<':
+        return lambda x, t=ref: x < t
+    if op == '>=':
+        return lambda x, t=ref: x >= t
+    return lambda x, s=ref: x in s
+
+
+class Node:
+    """
+    A parsed decision-tree node: a question and its condition branches.
+
+    Replaces the two-key dict per node: slotted instances skip the
+    per-instance hash table, so a node is a fixed two-field object with
+    direct attribute loads instead of string-keyed lookups. The mapping
+    dunders keep `node["question"]` / `"question" in node` call sites
+    working during migration.
+    """
+
+    __slots__ = ("question", "branches")
+
+    def __init__(self, question: str, branches: Dict[Any, Any] = None):
+        self.question = question
+        self.branches = {} if branches is None else branches
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "question":
+            return self.question
+        if key == "branches":
+            return self.branches
+        raise KeyError(key)
+
+    def __contains__(self, key: Any) -> bool:
+        return key == "question" or key == "branches"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key == "question":
+            return self.question
+        if key == "branches":
+            return self.branches
+        return default
+
+    def __eq__(self, other: Any) -> bool:
+        if other.__class__ is Node:
+            return (self.question == other.question
+                    and self.branches == other.branches)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"Node(question={self.question!r}, branches={self.branches!r})"
+
+
+# Opt-in process parallelism for parse_json_to_python. Worth enabling only
+# for trees with very wide tops (thousands of leaves per subtree); below
+# that, process spawn and pickling overhead dominate.
+PARALLEL = False
+_PARALLEL_MIN_BRANCHES = 64
+
+
+def _ordered_items(src: Dict[str, Any]):
+    """
+    Returns a node's branch items, hottest-first when the node carries
+    per-branch "weights" metadata.
+    """
+    branches = src.get("branches")
+    if not branches:
+        return ()
+    weights = src.get("weights")
+    if weights:
+        return sorted(branches.items(), key=lambda kv: -weights.get(kv[0], 0.0))
+    return branches.items()
+
+
+def _parse_parallel(json_data: Dict[str, Any]) -> Node:
+    """
+    Parses the top-level subtrees in a process pool and merges the results.
+
+    Each top-level branch is independent, so subtrees parse in parallel.
+    Workers run _parse_serial, which never consults PARALLEL: forked
+    workers inherit the flag, and dispatching through the public entry
+    point would re-enter this function and spawn nested pools on exactly
+    the wide subtrees this path targets.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    items = list(_ordered_items(json_data))
+    subtrees = [value for _, value in items if value.__class__ is dict]
+
+    with ProcessPoolExecutor() as pool:
+        parsed = iter(pool.map(_parse_serial, subtrees))
+
+    _parse = parse_condition_key
+    return Node(
+        sys.intern(json_data["question"]),
+        {
+            _parse(key): (next(parsed) if value.__class__ is dict else value)
+            for key, value in items
+        },
+    )
+
+
+def _parse_serial(json_data: Dict[str, Any]) -> Node:
+    """
+    The always-serial parse: iterative with an explicit worklist, so deep
+    trees pay no per-node call frame and cannot hit the recursion limit.
+
+    Never consults PARALLEL — pool workers call this directly.
+    """
+    # Questions repeat across subtrees in larger corpora; interning keeps
+    # one shared string object per distinct question.
+    _intern = sys.intern
+
+    root = Node(_intern(json_data["question"]))
+
+    # Local aliases: LOAD_FAST in the per-branch loop instead of the
+    # global/builtin lookups the interpreter would otherwise repeat.
+    _parse = parse_condition_key
+
+    stack = [(json_data, root)]
+    while stack:
+        src, dst = stack.pop()
+
+        # Hottest-first when the node carries "weights"; leaf-only nodes
+        # are skipped without building an items view.
+        items = _ordered_items(src)
+        if not items:
+            continue
+
+        # Accumulate (condition, child) pairs and build the dict once,
+        # right-sized, instead of growing and rehashing it per key.
+        pairs = []
+        for key, value in items:
+            # JSON decoding only ever yields exact dicts, so the identity
+            # type check is safe and faster than isinstance.
+            if value.__class__ is dict:
+                child = Node(_intern(value["question"]))
+                pairs.append((_parse(key), child))
+                stack.append((value, child))
+            else:
+                pairs.append((_parse(key), value))
+        dst.branches = dict(pairs)
 
-def parse_json_to_python(json_data: Dict[str, Any]) -> Dict[str, Any]:
+    return root
+
+
+def parse_json_to_python(json_data: Dict[str, Any]) -> Node:
+    """
+    Parses a JSON decision tree dictionary into `Node` objects with
+    string condition keys converted to Python tuples.
+
+    Set the module-level `PARALLEL` flag to fan very wide trees out
+    across processes; everything else runs the serial worklist parse.
+    """
+    if PARALLEL and len(json_data.get("branches") or {}) >= _PARALLEL_MIN_BRANCHES:
+        return _parse_parallel(json_data)
+    return _parse_serial(json_data)
+
+
+def parse_json_bytes(buf: Union[bytes, str]) -> Node:
     """
-    Recursively parses a JSON decision tree dictionary and converts
-    string condition keys into Python tuples.
+    Decodes raw decision-tree JSON and converts condition keys in one step.
+
+    msgspec's C decoder skips the text-mode decode and is several times
+    faster than stdlib json on dict-of-strings payloads, so loading a tree
+    from disk/network bytes avoids the json.loads + re-walk double pass.
     """
-    parsed = {
-        "question": json_data["question"],
-        "branches": {}
+    # Imported here so the stdlib json path works without msgspec installed.
+    import msgspec
+
+    return parse_json_to_python(msgspec.json.decode(buf))
+
+
+# Op codes for the SoA layout produced by parse_json_to_soa.
+SOA_OPS = {"<": 0, ">=": 1, "in": 2, "eq": 3}
+
+
+def parse_json_to_soa(json_data: Dict[str, Any], dtype: str = None) -> Dict[str, Any]:
+    """
+    Flattens a JSON decision tree into parallel structure-of-arrays form
+    for cache-friendly, vectorizable evaluation.
+
+    The nested-dict output of `parse_json_to_python` is pointer-chasey;
+    here nodes and branches live in contiguous arrays, so traversal is
+    index arithmetic and batch evaluation can broadcast over many inputs.
+
+    Layout (node i's branches occupy slots branch_offsets[i] to
+    branch_offsets[i+1] of the per-branch arrays):
+
+    - questions: question text per node.
+    - branch_offsets: int32, length #nodes + 1.
+    - condition_ops: int8 op codes per branch (see SOA_OPS).
+    - condition_lo / condition_hi: int32 per branch. Threshold in lo for
+      '<' and '>=', inclusive bounds for 'in', eq_keys index in lo for 'eq'.
+    - child_idx: int32 per branch; a node index when >= 0, otherwise
+      -(leaf_values index + 1).
+    - leaf_values: leaf decision strings.
+    - eq_keys: string conditions referenced by 'eq' branches.
+
+    :param json_data: The raw decision-tree dict from JSON.
+    :param dtype: `None` keeps condition_lo/condition_hi at int32;
+        `'auto'` narrows them to the smallest signed dtype (int8, int16,
+        int32) that fits the values, shrinking the arrays 2-4x so small
+        domains like ages and scores stay cache-resident.
+    :return: Dict of the parallel arrays described above.
+    """
+    # Imported here, like msgspec above, so dict-based callers never pay
+    # for (or require) numpy.
+    import numpy as np
+
+    questions: list = []
+    branch_counts: list = []
+    ops: list = []
+    lo: list = []
+    hi: list = []
+    child_idx: list = []
+    leaf_values: list = []
+    eq_keys: list = []
+
+    # Breadth-first so each node's branches are contiguous and children
+    # get their final indices before their rows are written.
+    worklist = [json_data]
+    pending = 1  # nodes appended to worklist, assigned indices in order
+    for src in worklist:
+        questions.append(src["question"])
+        items = _ordered_items(src)
+        branch_counts.append(len(items))
+
+        for key, value in items:
+            condition = parse_condition_key(key)
+            if condition.__class__ is tuple:
+                op, ref = condition
+                if op == 'in':
+                    ops.append(SOA_OPS['in'])
+                    if ref.__class__ is range:
+                        lo.append(ref.start)
+                        hi.append(ref.stop - 1)
+                    else:
+                        lo.append(min(ref))
+                        hi.append(max(ref))
+                else:
+                    ops.append(SOA_OPS[op])
+                    lo.append(ref)
+                    hi.append(0)
+            else:
+                ops.append(SOA_OPS['eq'])
+                lo.append(len(eq_keys))
+                hi.append(0)
+                eq_keys.append(condition)
+
+            if value.__class__ is dict:
+                child_idx.append(pending)
+                pending += 1
+                worklist.append(value)
+            else:
+                child_idx.append(-(len(leaf_values) + 1))
+                leaf_values.append(value)
+
+    offsets = [0]
+    for count in branch_counts:
+        offsets.append(offsets[-1] + count)
+
+    cond_dtype = np.int32
+    if dtype == 'auto' and lo:
+        # Narrowest signed dtype covering both condition arrays.
+        low, high = min(min(lo), min(hi)), max(max(lo), max(hi))
+        if -128 <= low and high <= 127:
+            cond_dtype = np.int8
+        elif -32768 <= low and high <= 32767:
+            cond_dtype = np.int16
+
+    return {
+        "questions": questions,
+        "branch_offsets": np.asarray(offsets, dtype=np.int32),
+        "condition_ops": np.asarray(ops, dtype=np.int8),
+        "condition_lo": np.asarray(lo, dtype=cond_dtype),
+        "condition_hi": np.asarray(hi, dtype=cond_dtype),
+        "child_idx": np.asarray(child_idx, dtype=np.int32),
+        "leaf_values": leaf_values,
+        "eq_keys": eq_keys,
     }
 
-    for key, value in json_data.get("branches", {}).items():
-        condition = parse_condition_key(key)
 
-        if isinstance(value, dict):
-            parsed["branches"][condition] = parse_json_to_python(value)
-        else:
-            parsed["branches"][condition] = value
+# Bounded LRU for parse_json_cached: content digest -> parsed tree.
+_PARSE_CACHE_MAX = 64
+_parse_cache: "OrderedDict[bytes, Node]" = OrderedDict()
+
+
+def parse_json_cached(raw: Union[bytes, str]) -> Node:
+    """
+    Opt-in cache over decode + parse, keyed by a content hash of the raw
+    JSON, for services that re-parse the same few trees per request.
+
+    A repeat call costs one blake2b of the input and a dict hit. The
+    returned tree is shared between callers, so treat it as read-only;
+    use `parse_json_to_python` directly if you need to mutate the result.
+    """
+    data = raw.encode() if raw.__class__ is str else raw
+    digest = hashlib.blake2b(data, digest_size=16).digest()
+
+    tree = _parse_cache.get(digest)
+    if tree is not None:
+        _parse_cache.move_to_end(digest)
+        return tree
+
+    tree = parse_json_to_python(json.loads(data))
+    _parse_cache[digest] = tree
+    if len(_parse_cache) > _PARSE_CACHE_MAX:
+        _parse_cache.popitem(last=False)
+    return tree
+
+
+def _condition_matches(condition: Union[tuple, str], value: Any) -> bool:
+    """
+    Evaluates one parsed condition against a value.
+    """
+    if condition.__class__ is tuple:
+        op, ref = condition
+        if op == '>=':
+            return value >= ref
+        if op == '<':
+            return value < ref
+        if op == 'in':
+            return value in ref
+        return False
+    return value == condition
+
+
+class LazyNode:
+    """
+    Wraps a raw JSON decision-tree dict and parses condition keys only
+    when a branch is actually visited.
+
+    Eager parse_json_to_python converts every key even if the decision
+    path never touches that subtree; here each node converts its own
+    branch keys on first access (memoized on the node), so sparse
+    evaluation of a large tree pays only for the path it walks.
+    """
+
+    __slots__ = ("_raw", "_branches")
+
+    def __init__(self, raw: Dict[str, Any]):
+        self._raw = raw
+        self._branches = None  # parsed condition -> raw child, on first visit
+
+    @property
+    def question(self) -> str:
+        return self._raw["question"]
+
+    def branches(self) -> Dict[Union[tuple, str], Any]:
+        """
+        Returns this node's branches with parsed condition keys,
+        converting (and caching) them on the first call.
+        """
+        if self._branches is None:
+            self._branches = {
+                parse_condition_key(key): value
+                for key, value in self._raw.get("branches", {}).items()
+            }
+        return self._branches
 
-    return parsed
+    def __getitem__(self, value: Any) -> Any:
+        """
+        Follows the first branch whose condition matches `value`,
+        returning a LazyNode for a nested subtree or the leaf string.
+        """
+        for condition, child in self.branches().items():
+            if _condition_matches(condition, value):
+                return LazyNode(child) if child.__class__ is dict else child
+        raise KeyError(value)